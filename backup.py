@@ -10,16 +10,20 @@ Required files in data/:
     contacts.vcf          (exported from Android Contacts app)
 """
 
-import json
-import shutil
-import subprocess
+import argparse
+import logging
+import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
 from pathlib import Path
 
+import orjson
+
 from src.key_setup import create_key
-from src.decryption import decrypt_databases
+from src.decryption import decrypt_databases, load_backup_key
 from src.vcf_to_contacts import parse_vcard_file
-from src.parse_db import parse
+from src.parse_db import Message, parse
 
 ROOT = Path(__file__).parent
 DATA_DIR = ROOT / "data"
@@ -27,75 +31,160 @@ OUTPUT_DIR = ROOT / "output"
 KEY_FILE = ROOT / "encrypted_backup.key"
 VCF_FILE = DATA_DIR / "contacts.vcf"
 
-
-def check_wadecrypt() -> None:
-    """Ensure wa-crypt-tools is installed."""
-    if not shutil.which("wadecrypt"):
+log = logging.getLogger(__name__)
+
+
+def _json_default(obj):
+    """orjson fallback: messages as their archive dicts, anything else as str."""
+    if isinstance(obj, Message):
+        return obj.to_dict()
+    return str(obj)
+
+
+def write_archive(
+    archive: dict, output_path: Path, pretty: bool = False, compressor=None
+) -> None:
+    """Write the archive as JSON, serializing one chat at a time.
+
+    Output is compact unless pretty is set (or pretty-print it with `jq .`).
+    With a zstd compressor, output_path is written as a zstd stream.
+    """
+    # Messages are slots dataclasses; passing them through to _json_default
+    # leaves their unset optional fields out of the archive
+    option = orjson.OPT_PASSTHROUGH_DATACLASS
+    if pretty:
+        option |= orjson.OPT_INDENT_2
+    nl, indent, colon = (b"\n", b"  ", b": ") if pretty else (b"", b"", b":")
+
+    def dumps(value, depth: int) -> bytes:
+        """Serialize value, re-indented to sit depth levels deep when pretty."""
+        chunk = orjson.dumps(value, option=option, default=_json_default)
+        if pretty:
+            # Safe: raw newlines only occur between tokens, never inside strings
+            chunk = chunk.replace(b"\n", b"\n" + indent * depth)
+        return chunk
+
+    with ExitStack() as stack:
+        f = stack.enter_context(open(output_path, "wb", buffering=1 << 20))
+        if compressor is not None:
+            f = stack.enter_context(compressor.stream_writer(f, closefd=False))
+
+        f.write(b"{" + nl)
+        for key, value in archive.items():
+            if key != "chats":
+                value_json = dumps(value, 1)
+                f.write(b'%s"%s"%s%s,%s' % (indent, key.encode(), colon, value_json, nl))
+
+        # Never hold the whole serialized archive in memory
+        f.write(b'%s"chats"%s[' % (indent, colon))
+        for i, chat in enumerate(archive["chats"]):
+            f.write(b"," + nl if i else nl)
+            f.write(indent * 2 + dumps(chat, 2))
+        f.write(nl + indent + b"]" + nl + b"}\n")
+
+
+def zstd_compressor():
+    """Return a multi-threaded zstd compressor, if zstandard is installed."""
+    try:
+        import zstandard
+    except ImportError:
         sys.exit(
-            "Error: wadecrypt not found.\n"
-            "  Install with: pip install wa-crypt-tools"
+            "Error: zstandard not found.\n"
+            "  Install with: pip install zstandard"
         )
+    # Level 10 compresses JSON ~4x while staying faster than gzip -6
+    return zstandard.ZstdCompressor(level=10, threads=-1)
 
 
 def main() -> None:
-    print("WhatsApp Backup Exporter")
-    print("=" * 40)
+    parser = argparse.ArgumentParser(description="Export a WhatsApp backup to JSON.")
+    parser.add_argument(
+        "--pretty", action="store_true",
+        help="indent archive.json for reading (larger and slower to write)",
+    )
+    parser.add_argument(
+        "--compress", action="store_true",
+        help="write output/archive.json.zst (needs: pip install zstandard)",
+    )
+    args = parser.parse_args()
+    # Fail before any work if zstandard is missing
+    compressor = zstd_compressor() if args.compress else None
+
+    # One handler for every module's status output
+    logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stderr)
+
+    log.info("WhatsApp Backup Exporter")
+    log.info("=" * 40)
 
-    check_wadecrypt()
     DATA_DIR.mkdir(exist_ok=True)
     OUTPUT_DIR.mkdir(exist_ok=True)
 
     # Key setup — runs automatically on first use
     if not KEY_FILE.exists():
-        print(
+        log.info(
             "\nNo encryption key found — running first-time setup.\n"
             "Find your key in WhatsApp:\n"
             "  Settings → Chats → Chat backup → Encryption key\n"
         )
-        create_key()
-        print()
+        create_key(KEY_FILE)
+        log.info("")
 
-    # Validate required input files
-    crypt_files = sorted(DATA_DIR.glob("*.crypt15"))
-    if not crypt_files:
+    # Read and derive the key once, and fail before any work if it's invalid
+    try:
+        key = load_backup_key(KEY_FILE)
+    except ValueError as e:
+        sys.exit(f"Error: {e}\n  Delete it and run again to re-enter your key.")
+
+    # Validate required input files — one scan of data/ covers both checks
+    with os.scandir(DATA_DIR) as entries:
+        data_files = {entry.name for entry in entries if entry.is_file()}
+    if not any(name.endswith(".crypt15") for name in data_files):
         sys.exit(
             f"Error: No .crypt15 files found in {DATA_DIR}/\n"
             f"  Copy msgstore.db.crypt15 from your phone to {DATA_DIR}/"
         )
 
-    if not VCF_FILE.exists():
+    if VCF_FILE.name not in data_files:
         sys.exit(
             f"Error: contacts.vcf not found in {DATA_DIR}/\n"
             f"  Export contacts from your phone's Contacts app and copy to {DATA_DIR}/"
         )
 
-    # Step 1 — Decrypt
-    print("\nDecrypting database...")
-    decrypted = decrypt_databases(KEY_FILE, DATA_DIR)
-    db_path = next(
-        (p for p in decrypted if p.name == "msgstore.db"), decrypted[0]
-    )
+    # Contacts parse on a background thread while the database decrypts
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        contacts_future = pool.submit(
+            lambda: dict(parse_vcard_file(str(VCF_FILE)))
+        )
+
+        # Step 1 — Decrypt
+        log.info("\nDecrypting database...")
+        try:
+            decrypted = decrypt_databases(key, DATA_DIR)
+        except ValueError as e:
+            sys.exit(f"Error: {e}")
+        db_path = next(
+            (p for p in decrypted if p.name == "msgstore.db"), decrypted[0]
+        )
 
-    # Step 2 — Parse contacts
-    print("\nParsing contacts...")
-    contacts = parse_vcard_file(str(VCF_FILE))
-    print(f"  {len(contacts)} contact mappings loaded.")
+        # Step 2 — Parse contacts
+        log.info("\nParsing contacts...")
+        contacts = contacts_future.result()
+        log.info(f"  {len(contacts)} contact mappings loaded.")
 
     # Step 3 — Parse database
-    print("\nParsing database...")
+    log.info("\nParsing database...")
     archive = parse(str(db_path), contacts)
 
     # Step 4 — Write output
-    output_path = OUTPUT_DIR / "archive.json"
-    with open(output_path, "w", encoding="utf-8") as f:
-        json.dump(archive, f, ensure_ascii=False, indent=2, default=str)
+    output_path = OUTPUT_DIR / ("archive.json.zst" if args.compress else "archive.json")
+    write_archive(archive, output_path, pretty=args.pretty, compressor=compressor)
 
     size_mb = output_path.stat().st_size / (1024 * 1024)
-    print(
+    log.info(
         f"\nDone — {archive['total_messages']:,} messages "
         f"from {archive['total_chats']} chats"
     )
-    print(f"  Saved to {output_path} ({size_mb:.1f} MB)")
+    log.info(f"  Saved to {output_path} ({size_mb:.1f} MB)")
 
 
 if __name__ == "__main__":
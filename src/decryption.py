@@ -1,25 +1,208 @@
-"""Decrypt WhatsApp .crypt15 backup files using wadecrypt."""
+"""Decrypt WhatsApp .crypt15 backup files in-process with AES-GCM.
 
-import subprocess
+A .crypt15 file is laid out as:
+
+    [1 byte header size][optional 0x01 feature flag][protobuf header]
+    [zlib-compressed database, AES-256-GCM encrypted][16 byte GCM tag]
+    [16 byte MD5 checksum of everything before it]
+
+Multi-file backups omit the trailing checksum.
+"""
+
+import hashlib
+import hmac
+import logging
+import mmap
+import multiprocessing
+import os
+import zlib
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+# encrypted_backup.key is a Java-serialized byte[32] holding the root key:
+# stream magic, array/class descriptor for "[B", its serialVersionUID, length
+KEY_FILE_HEADER = (
+    b"\xac\xed\x00\x05\x75\x72\x00\x02[B"
+    b"\xac\xf3\x17\xf8\x06\x08\x54\xe0"
+    b"\x02\x00\x00\x78\x70\x00\x00\x00\x20"
+)
+ROOT_KEY_LENGTH = 32
+IV_LENGTH = 16
+TAG_LENGTH = 16
+CHECKSUM_LENGTH = 16
+ZIP_HEADER = b"PK\x03\x04"
+# Size byte + feature flag + at most 255 bytes of protobuf
+MAX_HEADER_LENGTH = 2 + 255
+CHUNK_SIZE = 1 << 20
+
+log = logging.getLogger(__name__)
+
+
+def load_backup_key(key_path: Path) -> bytes:
+    """Read encrypted_backup.key and derive the AES-256 backup encryption key."""
+    blob = key_path.read_bytes()
+    if len(blob) != len(KEY_FILE_HEADER) + ROOT_KEY_LENGTH or not blob.startswith(KEY_FILE_HEADER):
+        raise ValueError(f"{key_path} is not a valid crypt15 key file.")
+    root_key = blob[len(KEY_FILE_HEADER):]
+
+    # HKDF-SHA256 (zero salt, single block) with "backup encryption" as info
+    prk = hmac.new(b"\x00" * 32, root_key, hashlib.sha256).digest()
+    return hmac.new(prk, b"backup encryption\x01", hashlib.sha256).digest()
+
+
+def _read_varint(buf: bytes, pos: int) -> tuple[int, int]:
+    """Decode a protobuf varint at pos. Returns (value, new_pos)."""
+    value = shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, pos
+        shift += 7
+
+
+def _find_field(buf: bytes, field_number: int) -> bytes | None:
+    """Return the first length-delimited field with the given number."""
+    pos = 0
+    while pos < len(buf):
+        tag, pos = _read_varint(buf, pos)
+        number, wire_type = tag >> 3, tag & 0x07
+        if wire_type == 0:
+            _, pos = _read_varint(buf, pos)
+        elif wire_type == 1:
+            pos += 8
+        elif wire_type == 5:
+            pos += 4
+        elif wire_type == 2:
+            length, pos = _read_varint(buf, pos)
+            if number == field_number:
+                return buf[pos:pos + length]
+            pos += length
+        else:
+            raise ValueError(f"Unsupported protobuf wire type {wire_type}.")
+    return None
+
+
+def parse_header(data: bytes) -> tuple[bytes, int]:
+    """Parse the crypt15 header. Returns (iv, offset of the ciphertext)."""
+    header_size = data[0]
+    offset = 1
+    # A 0x01 here marks the optional msgstore feature table
+    if data[offset] == 0x01:
+        offset += 1
+    header = data[offset:offset + header_size]
+
+    # BackupPrefix.c15_iv (field 3) → C15_IV.IV (field 1)
+    c15_iv = _find_field(header, 3)
+    iv = _find_field(c15_iv, 1) if c15_iv is not None else None
+    if iv is None or len(iv) != IV_LENGTH:
+        raise ValueError("Could not find a crypt15 IV in the backup header.")
+
+    return iv, offset + header_size
 
-def decrypt_databases(key_path: Path, db_dir: Path) -> list[Path]:
-    """Decrypt all .crypt15 files in db_dir. Returns paths to decrypted files."""
-    crypt_files = sorted(db_dir.glob("*.crypt15"))
+
+def decrypt_file(key: bytes, encrypted: Path, output: Path) -> None:
+    """Stream-decrypt and decompress a single .crypt15 file to output."""
+    with open(encrypted, "rb") as src, \
+            mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ) as mm, \
+            memoryview(mm) as data:
+        iv, offset = parse_header(mm[:MAX_HEADER_LENGTH])
+
+        # Everything up to the last 32 bytes is ciphertext; those are either
+        # [tag][checksum] or, in multi-file backups, [ciphertext][tag].
+        body_end = len(data) - TAG_LENGTH - CHECKSUM_LENGTH
+        file_hash = hashlib.md5(mm[:offset])
+        decryptor = Cipher(algorithms.AES(key), modes.GCM(iv)).decryptor()
+        inflater = zlib.decompressobj()
+        is_zip: bool | None = None
+        # update_into() needs block_size - 1 bytes of slack
+        plaintext = bytearray(CHUNK_SIZE + 15)
+
+        try:
+            with open(output, "wb", buffering=CHUNK_SIZE) as dst:
+                def emit(chunk: memoryview | bytes) -> None:
+                    """Decrypt chunk (straight from the mapping) and write it out."""
+                    nonlocal is_zip
+                    n = decryptor.update_into(chunk, plaintext)
+                    with memoryview(plaintext)[:n] as out:
+                        if is_zip is None:
+                            is_zip = out[:len(ZIP_HEADER)] == ZIP_HEADER
+                        dst.write(out if is_zip else inflater.decompress(out))
+
+                for start in range(offset, body_end, CHUNK_SIZE):
+                    # Views must be released before the mapping can close
+                    with data[start:min(start + CHUNK_SIZE, body_end)] as chunk:
+                        file_hash.update(chunk)
+                        emit(chunk)
+
+                tail = mm[body_end:]
+                file_hash.update(tail[:TAG_LENGTH])
+                if file_hash.digest() == tail[TAG_LENGTH:]:
+                    tag = tail[:TAG_LENGTH]
+                else:
+                    emit(tail[:TAG_LENGTH])
+                    tag = tail[TAG_LENGTH:]
+
+                decryptor.finalize_with_tag(tag)
+                if not is_zip:
+                    dst.write(inflater.flush())
+        except (InvalidTag, zlib.error):
+            # Plaintext is written before the tag can be checked — discard it
+            output.unlink(missing_ok=True)
+            raise ValueError(
+                f"Could not decrypt {encrypted.name} — "
+                "wrong key or corrupted backup."
+            ) from None
+
+
+def find_backups(db_dir: Path) -> list[Path]:
+    """List the .crypt15 files in db_dir with a single directory scan."""
+    with os.scandir(db_dir) as entries:
+        return sorted(
+            Path(entry.path) for entry in entries
+            if entry.name.endswith(".crypt15") and entry.is_file()
+        )
+
+
+def _decrypt_one(key: bytes, encrypted: Path) -> Path:
+    """Worker entry point: decrypt one backup next to itself."""
+    output = encrypted.with_suffix("")
+    decrypt_file(key, encrypted, output)
+    return output
+
+
+def decrypt_databases(key: bytes, db_dir: Path) -> list[Path]:
+    """Decrypt all .crypt15 files in db_dir. Returns paths to decrypted files.
+
+    key is the derived backup key from load_backup_key(), read once by the
+    caller and shared by every file.
+    """
+    crypt_files = find_backups(db_dir)
     if not crypt_files:
         raise FileNotFoundError(f"No .crypt15 files found in {db_dir}/")
 
-    decrypted: list[Path] = []
-    for encrypted in crypt_files:
-        output = encrypted.with_suffix("")
-        print(f"  Decrypting {encrypted.name}...")
-        subprocess.run(
-            ["wadecrypt", str(key_path), str(encrypted), str(output)],
-            check=True,
-            capture_output=True,
-        )
-        print(f"  ✓ {output.name}")
-        decrypted.append(output)
+    if len(crypt_files) == 1:
+        log.info(f"  Decrypting {crypt_files[0].name}...")
+        output = _decrypt_one(key, crypt_files[0])
+        log.info(f"  ✓ {output.name}")
+        return [output]
+
+    # Files are independent, so decrypt them on separate cores
+    log.info(f"  Decrypting {len(crypt_files)} files...")
+    workers = min(len(crypt_files), os.cpu_count() or 1)
+    # Spawn rather than fork: backup.py parses contacts on a thread meanwhile,
+    # and forking a multi-threaded process is unsafe
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        futures = [pool.submit(_decrypt_one, key, path) for path in crypt_files]
+        decrypted: list[Path] = []
+        for future in futures:
+            output = future.result()
+            log.info(f"  ✓ {output.name}")
+            decrypted.append(output)
 
     return decrypted
@@ -1,30 +1,40 @@
 """Create encrypted_backup.key from a WhatsApp hex key."""
 
-import re
-import subprocess
+import logging
+from getpass import getpass
 from pathlib import Path
 
+from src.decryption import KEY_FILE_HEADER, ROOT_KEY_LENGTH
+
 HEX_KEY_LENGTH = 64
 
+# Separators people paste along with the key (WhatsApp shows it in groups)
+_SEPARATORS = str.maketrans("", "", " \t\r\n-:_")
+
+log = logging.getLogger(__name__)
+
 
-def create_key() -> Path:
-    """Prompt for the 64-char hex key and generate encrypted_backup.key."""
-    raw = input("Paste your 64-character WhatsApp hex key: ").strip()
-    cleaned = re.sub(r"[^0-9a-fA-F]", "", raw)
+def create_key(key_path: Path = Path("encrypted_backup.key")) -> Path:
+    """Prompt for the 64-char hex key and write encrypted_backup.key."""
+    # getpass keeps the key off the screen and out of readline history
+    raw = getpass("Paste your 64-character WhatsApp hex key (hidden): ").strip()
+    cleaned = raw.translate(_SEPARATORS)
 
     if not cleaned:
         raise ValueError("No hex characters found in input.")
 
-    if len(cleaned) != HEX_KEY_LENGTH:
+    try:
+        root_key = bytes.fromhex(cleaned)
+    except ValueError as e:
+        raise ValueError(f"Non-hex character in key: {e}") from None
+
+    if len(root_key) != ROOT_KEY_LENGTH:
         raise ValueError(
             f"Expected {HEX_KEY_LENGTH} hex characters, got {len(cleaned)}."
         )
 
-    subprocess.run(["wacreatekey", "--hex", cleaned], check=True)
-
-    key_path = Path("encrypted_backup.key")
-    if not key_path.exists():
-        raise RuntimeError("wacreatekey did not produce encrypted_backup.key.")
+    # Same Java-serialized byte[] that wacreatekey produces
+    key_path.write_bytes(KEY_FILE_HEADER + root_key)
 
-    print("encrypted_backup.key created successfully.")
+    log.info(f"{key_path.name} created successfully.")
     return key_path
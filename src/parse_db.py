@@ -7,10 +7,26 @@ message edit history, polls with votes, and thumbnail previews.
 
 from __future__ import annotations
 
-import base64
+import functools
+import logging
 import os
 import sqlite3
+import sys
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, fields
 from datetime import datetime, timezone
+from pathlib import Path
+
+try:
+    # SIMD-accelerated base64 for thumbnails (pip install pybase64)
+    from pybase64 import b64encode_as_string
+except ImportError:
+    import base64
+
+    def b64encode_as_string(data: bytes) -> str:  # type: ignore[misc]
+        return base64.b64encode(data).decode("ascii")
 
 # ──────────────────────────────────────────────
 # WhatsApp message_type mapping (from schema inspection)
@@ -38,22 +54,122 @@ MESSAGE_TYPES = {
     116: "event",
 }
 
+STATUS_MAP = {0: "received", 4: "sent", 5: "delivered", 6: "read", 13: "played"}
+
+CALL_RESULTS = {
+    0: "unknown",
+    2: "missed",
+    3: "rejected",
+    4: "busy",
+    5: "answered",
+    7: "unavailable",
+    8: "declined",
+}
+
+# Temp tables holding the mappings above, created on every connection so
+# queries can resolve codes with an indexed join (see sql_lookup)
+LOOKUP_TABLES = {
+    "message_type_names": MESSAGE_TYPES,
+    "status_names": STATUS_MAP,
+    "call_result_names": CALL_RESULTS,
+}
 
+# Tables a builder needs in full; older schemas may lack them
+REACTION_TABLES = {"message_add_on", "message_add_on_reaction"}
+POLL_TABLES = {
+    "message_poll",
+    "message_poll_option",
+    "message_add_on",
+    "message_add_on_poll_vote",
+    "message_add_on_poll_vote_selected_option",
+}
+
+
+@functools.lru_cache(maxsize=4096)
 def ts_to_iso(ts_ms: int | None) -> str | None:
-    """Convert WhatsApp millisecond timestamp to ISO 8601 string."""
+    """Convert WhatsApp millisecond timestamp to ISO 8601 string.
+
+    Same output as datetime.isoformat() on a UTC datetime, without building one.
+    """
     if not ts_ms or ts_ms <= 0:
         return None
+    seconds, ms = divmod(int(ts_ms), 1000)
     try:
-        return datetime.fromtimestamp(ts_ms / 1000, tz=timezone.utc).isoformat()
-    except (OSError, ValueError):
+        t = time.gmtime(seconds)
+    except (OSError, OverflowError, ValueError):
         return None
+    if t.tm_year > 9999:
+        return None
+    iso = "%04d-%02d-%02dT%02d:%02d:%02d" % t[:6]
+    return f"{iso}.{ms:03d}000+00:00" if ms else f"{iso}+00:00"
+
+
+def sql_iso(column: str) -> str:
+    """SQL equivalent of ts_to_iso() for a millisecond timestamp column."""
+    return (
+        f"CASE WHEN {column} > 0 THEN"
+        f" strftime('%Y-%m-%dT%H:%M:%S', {column} / 1000, 'unixepoch')"
+        f" || CASE WHEN {column} % 1000 THEN printf('.%03d000', {column} % 1000) ELSE '' END"
+        f" || '+00:00' END"
+    )
+
+
+def sql_lookup(column: str, table: str, alias: str, fallback_prefix: str) -> tuple[str, str]:
+    """SQL equivalent of mapping.get(column, f"{fallback_prefix}{column}").
+
+    Resolves through one of the LOOKUP_TABLES; returns the select expression
+    and the LEFT JOIN clause it needs.
+    """
+    join = f"LEFT JOIN {table} {alias} ON {alias}.code = {column}"
+    return f"IFNULL({alias}.name, '{fallback_prefix}' || IFNULL({column}, 'None'))", join
+
+
+log = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class Message:
+    """One message. Much smaller than a dict while the archive is in memory.
 
+    Serialize with to_dict(): optional fields are left out while unset.
+    """
+
+    id: int
+    key_id: str | None
+    from_me: bool
+    timestamp: str | None
+    timestamp_ms: int | None
+    type: str
+    text: str | None
+    status: str
+    starred: bool
+    sender_jid: str | None = None
+    sender_name: str | None = None
+    received_timestamp: str | None = None
+    reply_to: dict | None = None
+    reactions: list[dict] | None = None
+    media: dict | None = None
+    edited: dict | None = None
+    poll: dict | None = None
+    thumbnail: str | None = None
+
+    def to_dict(self) -> dict:
+        """Return the archive form of the message, in field order."""
+        return {
+            name: value
+            for name, optional in _MESSAGE_FIELDS
+            if (value := getattr(self, name)) is not None or not optional
+        }
 
 
+# (name, optional) per Message field, in declaration order
+_MESSAGE_FIELDS = tuple((f.name, f.default is None) for f in fields(Message))
+
 def get_display_name(jid: str, contacts_mapping: dict[str, str]) -> tuple[str, bool]:
     """
     Get human-readable name for a JID.
     
+    parse() memoizes this per JID for its own contacts mapping.
     Returns: (name, found_in_contacts)
     """
     if not jid:
@@ -64,21 +180,30 @@ def get_display_name(jid: str, contacts_mapping: dict[str, str]) -> tuple[str, b
         return (jid, False)
     
     # Extract phone number from JID (e.g., "358401234567@s.whatsapp.net" -> "358401234567")
-    phone = jid.split("@")[0] if "@" in jid else jid
+    # Interned so the lookup hits the identity fast path against the
+    # interned VCF numbers
+    phone = sys.intern(jid.partition("@")[0])
     
-    # Try with +, then without
-    for variant in [f"+{phone}", phone]:
-        if variant in contacts_mapping:
-            return (contacts_mapping[variant], True)
+    # Contacts are keyed by the canonical number without "+"
+    name = contacts_mapping.get(phone.lstrip("+"))
+    if name is not None:
+        return (name, True)
     
     # Fallback to phone number
     return (phone, False)
 
 
+def list_tables(cursor: sqlite3.Cursor) -> set[str]:
+    """Return the names of all tables in the database."""
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+    return {name for (name,) in cursor}
+
+
 def build_jid_map(cursor: sqlite3.Cursor) -> dict[int, str]:
     """Build a mapping from jid row ID → raw JID string."""
-    cursor.execute("SELECT _id, raw_string FROM jid")
-    return {row[0]: row[1] for row in cursor.fetchall()}
+    # raw_string is nullable; such rows resolve like a missing jid
+    cursor.execute("SELECT _id, raw_string FROM jid WHERE raw_string IS NOT NULL")
+    return dict(cursor)
 
 
 def build_chat_list(cursor: sqlite3.Cursor, jid_map: dict[int, str]) -> list[dict]:
@@ -97,8 +222,7 @@ def build_chat_list(cursor: sqlite3.Cursor, jid_map: dict[int, str]) -> list[dic
     """)
 
     chats = []
-    for row in cursor.fetchall():
-        chat_id, jid_row_id, subject, group_type, created_ts, archived, ephemeral = row
+    for chat_id, jid_row_id, subject, group_type, created_ts, archived, ephemeral in cursor:
         jid = jid_map.get(jid_row_id, "")
         is_group = jid.endswith("@g.us") if jid else False
 
@@ -123,7 +247,7 @@ def build_group_participants(cursor: sqlite3.Cursor) -> dict[str, list[dict]]:
         FROM group_participants
     """)
     groups: dict[str, list[dict]] = {}
-    for gjid, member_jid, admin in cursor.fetchall():
+    for gjid, member_jid, admin in cursor:
         groups.setdefault(gjid, []).append({
             "jid": member_jid,
             "is_admin": bool(admin),
@@ -133,158 +257,57 @@ def build_group_participants(cursor: sqlite3.Cursor) -> dict[str, list[dict]]:
 
 def build_reactions_map(cursor: sqlite3.Cursor, jid_map: dict[int, str]) -> dict[int, list[dict]]:
     """Build mapping from parent message row ID → list of reactions."""
-    cursor.execute("""
+    cursor.execute(f"""
         SELECT
             ao.parent_message_row_id,
             ao.sender_jid_row_id,
             ar.reaction,
-            ar.sender_timestamp
+            {sql_iso("ar.sender_timestamp")}
         FROM message_add_on ao
         JOIN message_add_on_reaction ar ON ar.message_add_on_row_id = ao._id
         WHERE ao.message_add_on_type = 56
     """)
     reactions: dict[int, list[dict]] = {}
-    for parent_id, sender_jid_row_id, emoji, ts in cursor.fetchall():
+    for parent_id, sender_jid_row_id, emoji, timestamp in cursor:
         reactions.setdefault(parent_id, []).append({
             "emoji": emoji,
             "from": jid_map.get(sender_jid_row_id, ""),
-            "timestamp": ts_to_iso(ts),
+            "timestamp": timestamp,
         })
     return reactions
 
 
-def build_quoted_map(cursor: sqlite3.Cursor) -> dict[int, dict]:
-    """Build mapping from message row ID → quoted (replied-to) message info."""
-    cursor.execute("""
-        SELECT
-            message_row_id,
-            from_me,
-            sender_jid_row_id,
-            key_id,
-            message_type,
-            text_data
-        FROM message_quoted
-    """)
-    quoted: dict[int, dict] = {}
-    for msg_id, from_me, sender_jid, key_id, msg_type, text in cursor.fetchall():
-        quoted[msg_id] = {
-            "from_me": bool(from_me),
-            "sender_jid_row_id": sender_jid,
-            "key_id": key_id,
-            "type": MESSAGE_TYPES.get(msg_type, f"unknown_{msg_type}"),
-            "text": text,
-        }
-    return quoted
-
-
-def build_media_map(cursor: sqlite3.Cursor) -> dict[int, dict]:
-    """Build mapping from message row ID → media metadata."""
-    cursor.execute("""
-        SELECT
-            message_row_id,
-            mime_type,
-            file_path,
-            file_size,
-            file_length,
-            media_duration,
-            media_caption,
-            width,
-            height,
-            media_name,
-            file_hash
-        FROM message_media
-    """)
-    media: dict[int, dict] = {}
-    for row in cursor.fetchall():
-        msg_id = row[0]
-        media[msg_id] = {
-            "mime_type": row[1],
-            "file_path": row[2],
-            "file_size": row[3] or row[4],
-            "duration_seconds": row[5] if row[5] else None,
-            "caption": row[6],
-            "width": row[7] if row[7] else None,
-            "height": row[8] if row[8] else None,
-            "file_name": row[9],
-            "file_hash": row[10],
-        }
-    return media
-
-
-def build_call_logs_map(cursor: sqlite3.Cursor, jid_map: dict[int, str]) -> dict[int, dict]:
+def build_call_logs_map(cursor: sqlite3.Cursor, jid_map: dict[int, str]) -> dict[int, list[dict]]:
     """Build mapping from chat row ID → call log entry."""
-    cursor.execute("""
+    result_name, result_join = sql_lookup("c.call_result", "call_result_names", "crn", "result_")
+    cursor.execute(f"""
         SELECT
-            _id,
-            jid_row_id,
-            from_me,
-            call_id,
-            timestamp,
-            video_call,
-            duration,
-            call_result,
-            bytes_transferred
-        FROM call_log
+            c._id,
+            c.jid_row_id,
+            c.from_me,
+            c.call_id,
+            {sql_iso("c.timestamp")},
+            c.video_call,
+            c.duration,
+            {result_name},
+            c.bytes_transferred
+        FROM call_log c
+        {result_join}
     """)
-    CALL_RESULTS = {
-        0: "unknown",
-        2: "missed",
-        3: "rejected",
-        4: "busy",
-        5: "answered",
-        7: "unavailable",
-        8: "declined",
-    }
     calls: dict[int, list[dict]] = {}
-    for row in cursor.fetchall():
-        call_id, jid_row_id, from_me, call_sid, ts, video, dur, result, bytes_tx = row
+    for call_id, jid_row_id, from_me, call_sid, ts, video, dur, result, bytes_tx in cursor:
         calls.setdefault(jid_row_id, []).append({
             "call_id": call_sid,
-            "timestamp": ts_to_iso(ts),
+            "timestamp": ts,
             "from_me": bool(from_me),
             "video_call": bool(video),
             "duration_seconds": dur if dur else 0,
-            "result": CALL_RESULTS.get(result, f"result_{result}"),
+            "result": result,
             "bytes_transferred": bytes_tx if bytes_tx else 0,
         })
     return calls
 
 
-def build_edit_history_map(cursor: sqlite3.Cursor) -> dict[int, dict]:
-    """Build mapping from message row ID → edit info."""
-    cursor.execute("""
-        SELECT
-            message_row_id,
-            original_key_id,
-            edited_timestamp,
-            sender_timestamp
-        FROM message_edit_info
-    """)
-    edits: dict[int, dict] = {}
-    for msg_id, orig_key, edit_ts, sender_ts in cursor.fetchall():
-        edits[msg_id] = {
-            "original_key_id": orig_key,
-            "edited_at": ts_to_iso(edit_ts),
-            "sender_timestamp": ts_to_iso(sender_ts),
-        }
-    return edits
-
-
-def build_thumbnails_map(cursor: sqlite3.Cursor) -> dict[int, str]:
-    """Build mapping from message row ID → base64-encoded thumbnail."""
-    cursor.execute("""
-        SELECT
-            message_row_id,
-            thumbnail
-        FROM message_thumbnail
-    """)
-    thumbnails: dict[int, str] = {}
-    for msg_id, thumb_blob in cursor.fetchall():
-        if thumb_blob:
-            thumbnails[msg_id] = base64.b64encode(thumb_blob).decode("utf-8")
-    return thumbnails
-
-
 def build_polls_map(cursor: sqlite3.Cursor, jid_map: dict[int, str]) -> dict[int, dict]:
     """Build mapping from message row ID → poll data with options and votes."""
     # Get poll metadata
@@ -296,7 +319,7 @@ def build_polls_map(cursor: sqlite3.Cursor, jid_map: dict[int, str]) -> dict[int
         FROM message_poll
     """)
     polls: dict[int, dict] = {}
-    for msg_id, opt_count, poll_type in cursor.fetchall():
+    for msg_id, opt_count, poll_type in cursor:
         polls[msg_id] = {
             "max_selectable": opt_count,
             "poll_type": poll_type,
@@ -313,201 +336,325 @@ def build_polls_map(cursor: sqlite3.Cursor, jid_map: dict[int, str]) -> dict[int
         FROM message_poll_option
     """)
     option_id_to_msg: dict[int, int] = {}
-    for msg_id, opt_id, opt_name, vote_total in cursor.fetchall():
+    option_index: dict[tuple[int | None, int | None], dict] = {}
+    for msg_id, opt_id, opt_name, vote_total in cursor:
         if msg_id in polls:
-            polls[msg_id]["options"].append({
+            option = {
                 "option_id": opt_id,
                 "text": opt_name,
                 "vote_count": vote_total if vote_total else 0,
                 "voters": [],
-            })
+            }
+            polls[msg_id]["options"].append(option)
             option_id_to_msg[opt_id] = msg_id
+            option_index[(msg_id, opt_id)] = option
 
     # Get who voted for what
-    cursor.execute("""
+    cursor.execute(f"""
         SELECT
             ao.parent_message_row_id,
             ao.sender_jid_row_id,
-            pv.sender_timestamp,
+            {sql_iso("pv.sender_timestamp")},
             vso.message_poll_option_id
         FROM message_add_on ao
         JOIN message_add_on_poll_vote pv ON pv.message_add_on_row_id = ao._id
         JOIN message_add_on_poll_vote_selected_option vso ON vso.message_add_on_row_id = ao._id
         WHERE ao.message_add_on_type = 67
     """)
-    votes_by_msg_option: dict[tuple[int, int], list[dict]] = {}
-    for parent_msg_id, voter_jid_row_id, vote_ts, opt_id in cursor.fetchall():
+    votes_by_msg_option: dict[tuple[int | None, int | None], list[dict]] = {}
+    for parent_msg_id, voter_jid_row_id, vote_ts, opt_id in cursor:
         key = (parent_msg_id, opt_id)
         votes_by_msg_option.setdefault(key, []).append({
             "from": jid_map.get(voter_jid_row_id, ""),
-            "timestamp": ts_to_iso(vote_ts),
+            "timestamp": vote_ts,
         })
 
     # Attach voters to the correct option
-    for (msg_id, opt_id), voters in votes_by_msg_option.items():
-        if msg_id in polls:
-            for option in polls[msg_id]["options"]:
-                if option["option_id"] == opt_id:
-                    option["voters"] = voters
-                    break
+    for key, voters in votes_by_msg_option.items():
+        voted_option = option_index.get(key)
+        if voted_option is not None:
+            voted_option["voters"] = voters
 
     return polls
 
 
 def build_messages(
     cursor: sqlite3.Cursor,
+    tables: set[str],
     jid_map: dict[int, str],
     reactions_map: dict[int, list[dict]],
-    quoted_map: dict[int, dict],
-    media_map: dict[int, dict],
-    edit_history_map: dict[int, dict],
     polls_map: dict[int, dict],
-    thumbnails_map: dict[int, str],
-    contacts_mapping: dict[str, str] | None = None,
-) -> dict[int, list[dict]]:
-    """Load all messages, grouped by chat_row_id."""
-    cursor.execute("""
+    chat_by_id: dict[int, dict],
+    display_name: Callable[[str], tuple[str, bool]],
+) -> dict[str, int]:
+    """Load all messages into their chat's "messages" list.
+
+    Replies, media, edit info and thumbnails (at most one row per message)
+    are LEFT JOINed onto the message rows instead of loaded into maps.
+    display_name resolves a sender JID to (name, found_in_contacts).
+    Returns counts of messages (including any whose chat is missing from
+    chat_by_id), replies, media entries, thumbnails and edited messages.
+    """
+    status_name, status_join = sql_lookup("m.status", "status_names", "stn", "status_")
+    type_name, type_join = sql_lookup("m.message_type", "message_type_names", "mtn", "unknown_")
+    quoted_type_name, quoted_type_join = sql_lookup("mq.message_type", "message_type_names", "qtn", "unknown_")
+    joins = [status_join, type_join]
+
+    def joined(table: str, alias: str, *columns: str) -> str:
+        """Select columns of a 1→1 table, or NULLs if the backup lacks it."""
+        if table not in tables:
+            return ", ".join("NULL" for _ in columns)
+        joins.append(f"LEFT JOIN {table} {alias} ON {alias}.message_row_id = m._id")
+        return ", ".join(columns)
+
+    quoted_columns = joined(
+        "message_quoted", "mq",
+        "mq.message_row_id", "mq.from_me", "mq.sender_jid_row_id", "mq.key_id",
+        quoted_type_name, "mq.text_data",
+    )
+    if "message_quoted" in tables:
+        joins.append(quoted_type_join)
+    media_columns = joined(
+        "message_media", "mm",
+        "mm.message_row_id", "mm.mime_type", "mm.file_path", "mm.file_size",
+        "mm.file_length", "mm.media_duration", "mm.media_caption", "mm.width",
+        "mm.height", "mm.media_name", "mm.file_hash",
+    )
+    edit_columns = joined(
+        "message_edit_info", "me",
+        "me.message_row_id", "me.original_key_id",
+        sql_iso("me.edited_timestamp"), sql_iso("me.sender_timestamp"),
+    )
+    thumbnail_columns = joined("message_thumbnail", "mt", "b64(mt.thumbnail)")
+
+    # Timestamps, types and statuses are formatted by SQLite, in C
+    cursor.execute(f"""
         SELECT
-            _id,
-            chat_row_id,
-            from_me,
-            key_id,
-            sender_jid_row_id,
-            status,
-            timestamp,
-            received_timestamp,
-            message_type,
-            text_data,
-            starred
-        FROM message
-        WHERE _id != 1
-        ORDER BY timestamp ASC
+            m._id,
+            m.chat_row_id,
+            m.from_me,
+            m.key_id,
+            m.sender_jid_row_id,
+            {status_name},
+            m.timestamp,
+            {sql_iso("m.timestamp")},
+            {sql_iso("m.received_timestamp")},
+            {type_name},
+            m.text_data,
+            m.starred,
+            {quoted_columns},
+            {media_columns},
+            {edit_columns},
+            {thumbnail_columns}
+        FROM message m
+        {" ".join(joins)}
+        WHERE m._id != 1
+        ORDER BY m.chat_row_id, m.timestamp ASC
     """)
 
-    STATUS_MAP = {0: "received", 4: "sent", 5: "delivered", 6: "read", 13: "played"}
-    if contacts_mapping is None:
-        contacts_mapping = {}
-
-    messages_by_chat: dict[int, list[dict]] = {}
-    for row in cursor.fetchall():
-        msg_id, chat_row_id, from_me, key_id, sender_jid_row_id, status, ts, recv_ts, msg_type, text, starred = row
+    # Rows arrive grouped by chat, so the chat lookup runs once per chat
+    total_messages = replies = media_entries = thumbnails = edits = 0
+    current_chat_id: int | None = -1
+    current_messages: list | None = None
+    for (
+        msg_id, chat_row_id, from_me, key_id, sender_jid_row_id, status, ts, ts_iso, recv_iso, msg_type, text, starred,
+        quoted_id, q_from_me, q_sender_jid, q_key_id, q_type, q_text,
+        media_id, mime_type, file_path, file_size, file_length, duration, caption, width, height, file_name, file_hash,
+        edit_id, orig_key, edit_ts, edit_sender_ts,
+        thumbnail,
+    ) in cursor:
 
-        msg: dict = {
-            "id": msg_id,
-            "key_id": key_id,
-            "from_me": bool(from_me),
-            "timestamp": ts_to_iso(ts),
-            "timestamp_ms": ts,
-            "type": MESSAGE_TYPES.get(msg_type, f"unknown_{msg_type}"),
-            "text": text,
-            "status": STATUS_MAP.get(status, f"status_{status}"),
-            "starred": bool(starred),
-        }
+        msg = Message(msg_id, key_id, bool(from_me), ts_iso, ts, msg_type, text, status, bool(starred))
 
         # Sender (relevant in groups)
         if sender_jid_row_id and sender_jid_row_id in jid_map:
             sender_jid = jid_map[sender_jid_row_id]
-            msg["sender_jid"] = sender_jid
+            msg.sender_jid = sender_jid
             # Add human-readable sender name if available
-            sender_name, found_in_contacts = get_display_name(sender_jid, contacts_mapping)
+            sender_name, found_in_contacts = display_name(sender_jid)
             if found_in_contacts:  # Only add if we found it in contacts
-                msg["sender_name"] = sender_name
+                msg.sender_name = sender_name
 
         # Received timestamp
-        if recv_ts and recv_ts > 0:
-            msg["received_timestamp"] = ts_to_iso(recv_ts)
+        if recv_iso:
+            msg.received_timestamp = recv_iso
 
         # Reply / quote
-        if msg_id in quoted_map:
-            msg["reply_to"] = quoted_map[msg_id]
+        if quoted_id is not None:
+            replies += 1
+            msg.reply_to = {
+                "from_me": bool(q_from_me),
+                "sender_jid_row_id": q_sender_jid,
+                "key_id": q_key_id,
+                "type": q_type,
+                "text": q_text,
+            }
 
         # Reactions
         if msg_id in reactions_map:
-            msg["reactions"] = reactions_map[msg_id]
+            msg.reactions = reactions_map[msg_id]
 
         # Media
-        if msg_id in media_map:
-            msg["media"] = media_map[msg_id]
+        if media_id is not None:
+            media_entries += 1
+            msg.media = {
+                "mime_type": mime_type,
+                "file_path": file_path,
+                "file_size": file_size or file_length,
+                "duration_seconds": duration if duration else None,
+                "caption": caption,
+                "width": width if width else None,
+                "height": height if height else None,
+                "file_name": file_name,
+                "file_hash": file_hash,
+            }
 
         # Edit history
-        if msg_id in edit_history_map:
-            msg["edited"] = edit_history_map[msg_id]
+        if edit_id is not None:
+            edits += 1
+            msg.edited = {
+                "original_key_id": orig_key,
+                "edited_at": edit_ts,
+                "sender_timestamp": edit_sender_ts,
+            }
 
         # Poll data
         if msg_id in polls_map:
-            msg["poll"] = polls_map[msg_id]
+            msg.poll = polls_map[msg_id]
             # Override type if we have poll data (WhatsApp DB sometimes marks polls as type 66)
-            msg["type"] = "poll"
+            msg.type = "poll"
 
         # Thumbnail (base64-encoded preview image)
-        if msg_id in thumbnails_map:
-            msg["thumbnail"] = thumbnails_map[msg_id]
+        if thumbnail:
+            thumbnails += 1
+            msg.thumbnail = thumbnail
+
+        total_messages += 1
+        if chat_row_id != current_chat_id:
+            current_chat_id = chat_row_id
+            chat = chat_by_id.get(chat_row_id)
+            current_messages = chat["messages"] if chat is not None else None
+        if current_messages is not None:
+            current_messages.append(msg)
+
+    return {
+        "messages": total_messages,
+        "replies": replies,
+        "media": media_entries,
+        "thumbnails": thumbnails,
+        "edits": edits,
+    }
 
-        messages_by_chat.setdefault(chat_row_id, []).append(msg)
 
-    return messages_by_chat
+def open_readonly(db_path: str) -> sqlite3.Connection:
+    """Open the decrypted snapshot read-only, skipping locking and WAL checks."""
+    # immutable=1 is safe: nothing else writes to a freshly decrypted backup
+    uri = f"{Path(db_path).resolve().as_uri()}?mode=ro&immutable=1"
+    conn = sqlite3.connect(uri, uri=True)
+    conn.execute("PRAGMA temp_store=MEMORY")
+    # Map up to 1 GiB so large msgstore.db files are read without copying
+    # through the page cache (SQLite caps it at the file size)
+    conn.execute("PRAGMA mmap_size=1073741824")
+    conn.execute("PRAGMA cache_size=-65536")
+    # Temp tables live in memory, so this works on a read-only connection
+    for table, mapping in LOOKUP_TABLES.items():
+        conn.execute(f"CREATE TEMP TABLE {table}(code INTEGER PRIMARY KEY, name TEXT NOT NULL)")
+        conn.executemany(f"INSERT INTO {table} VALUES (?, ?)", mapping.items())
+    # b64(blob) lets queries return thumbnails already base64-encoded
+    conn.create_function(
+        "b64", 1, lambda blob: b64encode_as_string(blob) if blob else None, deterministic=True
+    )
+    return conn
+
+
+def run_builder(db_path: str, builder, *args):
+    """Run a builder on its own read-only connection, for use from a worker thread."""
+    conn = open_readonly(db_path)
+    try:
+        return builder(conn.cursor(), *args)
+    finally:
+        conn.close()
 
 
-def parse(db_path: str, contacts_mapping: dict[str, str] | None = None) -> dict:
-    """Parse the WhatsApp database and return the full archive dict."""
+def parse(
+    db_path: str, contacts_mapping: dict[str, str] | None = None, quiet: bool = False
+) -> dict:
+    """Parse the WhatsApp database and return the full archive dict.
+
+    Progress is logged at INFO level, or at DEBUG level when quiet is set.
+    """
     if contacts_mapping is None:
         contacts_mapping = {}
+    report = log.debug if quiet else log.info
 
-    conn = sqlite3.connect(db_path)
+    conn = open_readonly(db_path)
     cursor = conn.cursor()
 
-    print(f"  {len(contacts_mapping)} contacts loaded.")
+    # Older backups lack some of the newer tables; check the schema once
+    # and skip those builders instead of letting their queries fail
+    tables = list_tables(cursor)
+
+    # Resolve each sender JID once; local to this call, so concurrent
+    # parse() calls never share contacts or cached names
+    display_name = functools.lru_cache(maxsize=None)(
+        functools.partial(get_display_name, contacts_mapping=contacts_mapping)
+    )
+    report(f"  {len(contacts_mapping)} contacts loaded.")
     jid_map = build_jid_map(cursor)
-    print(f"  {len(jid_map)} JIDs loaded.")
+    report(f"  {len(jid_map)} JIDs loaded.")
+    # First row wins for a repeated raw_string, like the old linear scan
+    jid_row_by_string: dict[str, int] = {}
+    for rid, jid in jid_map.items():
+        jid_row_by_string.setdefault(jid, rid)
 
-    print("Loading chats...")
+    report("Loading chats...")
     chats = build_chat_list(cursor, jid_map)
-    print(f"  {len(chats)} chats loaded.")
-
-    print("Loading group participants...")
-    group_participants = build_group_participants(cursor)
-    print(f"  {len(group_participants)} groups with participant data.")
-
-    print("Loading reactions...")
-    reactions_map = build_reactions_map(cursor, jid_map)
+    report(f"  {len(chats)} chats loaded.")
+
+    # The remaining maps are independent of each other. sqlite3 releases the
+    # GIL while stepping a query, so each loads on its own connection and
+    # thread, overlapping SQLite work with row decoding on the others.
+    report("Loading group participants, reactions, call logs and polls...")
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        def submit(needed: bool, builder, *args):
+            return pool.submit(run_builder, db_path, builder, *args) if needed else None
+
+        participants_future = submit("group_participants" in tables, build_group_participants)
+        reactions_future = submit(REACTION_TABLES <= tables, build_reactions_map, jid_map)
+        call_logs_future = submit("call_log" in tables, build_call_logs_map, jid_map)
+        polls_future = submit(POLL_TABLES <= tables, build_polls_map, jid_map)
+
+        group_participants = participants_future.result() if participants_future else {}
+        reactions_map = reactions_future.result() if reactions_future else {}
+        call_logs_map = call_logs_future.result() if call_logs_future else {}
+        polls_map = polls_future.result() if polls_future else {}
+
+    report(f"  {len(group_participants)} groups with participant data.")
     total_reactions = sum(len(v) for v in reactions_map.values())
-    print(f"  {total_reactions} reactions across {len(reactions_map)} messages.")
-
-    print("Loading quoted messages (replies)...")
-    quoted_map = build_quoted_map(cursor)
-    print(f"  {len(quoted_map)} replies loaded.")
-
-    print("Loading media metadata...")
-    media_map = build_media_map(cursor)
-    print(f"  {len(media_map)} media entries loaded.")
-
-    print("Loading thumbnails...")
-    thumbnails_map = build_thumbnails_map(cursor)
-    print(f"  {len(thumbnails_map)} thumbnails loaded.")
-
-    print("Loading call logs...")
-    call_logs_map = build_call_logs_map(cursor, jid_map)
+    report(f"  {total_reactions} reactions across {len(reactions_map)} messages.")
     total_calls = sum(len(v) for v in call_logs_map.values())
-    print(f"  {total_calls} call log entries loaded.")
-
-    print("Loading message edit history...")
-    edit_history_map = build_edit_history_map(cursor)
-    print(f"  {len(edit_history_map)} edited messages loaded.")
-
-    print("Loading polls...")
-    polls_map = build_polls_map(cursor, jid_map)
+    report(f"  {total_calls} call log entries loaded.")
     total_poll_votes = sum(sum(len(opt["voters"]) for opt in p["options"]) for p in polls_map.values())
-    print(f"  {len(polls_map)} polls loaded with {total_poll_votes} votes.")
+    report(f"  {len(polls_map)} polls loaded with {total_poll_votes} votes.")
 
-    print("Loading messages...")
-    messages_by_chat = build_messages(cursor, jid_map, reactions_map, quoted_map, media_map, edit_history_map, polls_map, thumbnails_map, contacts_mapping)
-    total_messages = sum(len(v) for v in messages_by_chat.values())
-    print(f"  {total_messages} messages loaded across {len(messages_by_chat)} chats.")
-
-    # Attach messages, participants, and call logs to chats
+    # Messages are appended straight into their chat
+    chat_by_id: dict[int, dict] = {}
+    for chat in chats:
+        chat_by_id[chat.pop("chat_row_id")] = chat
+        chat["messages"] = []
+
+    report("Loading messages, replies, media, edits and thumbnails...")
+    counts = build_messages(cursor, tables, jid_map, reactions_map, polls_map, chat_by_id, display_name)
+    total_messages = counts["messages"]
+    chats_with_messages = sum(1 for chat in chats if chat["messages"])
+    report(f"  {total_messages} messages loaded across {chats_with_messages} chats.")
+    report(f"  {counts['replies']} replies loaded.")
+    report(f"  {counts['media']} media entries loaded.")
+    report(f"  {counts['thumbnails']} thumbnails loaded.")
+    report(f"  {counts['edits']} edited messages loaded.")
+
+    # Attach participants and call logs to chats
     for chat in chats:
-        chat_id = chat.pop("chat_row_id")
-        chat["messages"] = messages_by_chat.get(chat_id, [])
         chat["message_count"] = len(chat["messages"])
 
         # Attach group participants if applicable
@@ -515,11 +662,7 @@ def parse(db_path: str, contacts_mapping: dict[str, str] | None = None) -> dict:
             chat["participants"] = group_participants[chat["jid"]]
 
         # Attach call history
-        jid_row_id = None
-        for jid_id, jid_str in jid_map.items():
-            if jid_str == chat["jid"]:
-                jid_row_id = jid_id
-                break
+        jid_row_id = jid_row_by_string.get(chat["jid"])
         if jid_row_id and jid_row_id in call_logs_map:
             chat["call_history"] = call_logs_map[jid_row_id]
             chat["total_calls"] = len(call_logs_map[jid_row_id])
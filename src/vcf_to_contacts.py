@@ -1,7 +1,30 @@
-"""Parse a vCard (VCF) file into a phone-number → contact-name mapping."""
+"""Parse a vCard (VCF) file into phone-number → contact-name pairs."""
 
+import logging
+import mmap
 import os
+import quopri
 import re
+import sys
+from collections.abc import Iterator
+
+# One match per line of interest: card boundaries and FN / TEL lines
+# (params, then value). Binary fields are matched together with their
+# folded continuation lines, so the scan jumps over inline base64
+# payloads (often hundreds of KB per contact) without looking at them.
+_TOKEN_RE = re.compile(
+    rb"^(?:"
+    rb"(?:PHOTO|LOGO|SOUND|KEY)[;:][^\n]*(?:\n[ \t][^\n]*)*"
+    rb"|(BEGIN|END):VCARD"
+    rb"|(FN|TEL)([^:\r\n]*):([^\r\n]+)"
+    rb")",
+    re.M,
+)
+
+# Separators found in exported phone numbers, including tabs and NBSP
+_PHONE_STRIP = str.maketrans("", "", " -()\t\u00a0")
+
+log = logging.getLogger(__name__)
 
 
 def decode_quoted_printable(text: str) -> str:
@@ -10,94 +33,68 @@ def decode_quoted_printable(text: str) -> str:
         return text
     
     try:
-        # Handle UTF-8 quoted-printable encoding
-        # Replace =XX with chr(0xXX), then decode UTF-8
-        result = ""
-        i = 0
-        while i < len(text):
-            if text[i] == "=" and i + 2 < len(text):
-                hex_str = text[i+1:i+3]
-                try:
-                    result += chr(int(hex_str, 16))
-                    i += 3
-                except ValueError:
-                    result += text[i]
-                    i += 1
-            else:
-                result += text[i]
-                i += 1
-        
-        # Try to encode/decode as UTF-8 to handle multi-byte sequences
-        return result.encode('latin-1').decode('utf-8', errors='ignore')
+        # =XX escapes are UTF-8 bytes; quopri decodes them in C in one pass
+        return quopri.decodestring(text.encode("utf-8")).decode("utf-8", errors="ignore")
     except Exception:
         return text
 
 
-def parse_vcard_file(vcf_path: str) -> dict[str, str]:
-    """Parse a VCF file and extract phone → name mapping."""
-    if not os.path.isfile(vcf_path):
-        print(f"Error: VCF file not found at {vcf_path}")
-        return {}
-    
-    mapping: dict[str, str] = {}
-    
+def _decode_value(raw: bytes) -> str:
+    """Decode a captured vCard value, preferring UTF-8 over latin-1."""
     try:
-        with open(vcf_path, "r", encoding="utf-8") as f:
-            content = f.read()
+        return raw.decode("utf-8")
     except UnicodeDecodeError:
-        # Try with latin-1 if UTF-8 fails
-        with open(vcf_path, "r", encoding="latin-1") as f:
-            content = f.read()
+        return raw.decode("latin-1")
+
+
+def parse_vcard_file(vcf_path: str) -> Iterator[tuple[str, str]]:
+    """Parse a VCF file and yield (phone, name) pairs as cards are read.
+
+    Phone numbers are yielded once, without a leading "+"; build the
+    phone → name mapping with dict(parse_vcard_file(path)).
+    """
+    if not os.path.isfile(vcf_path):
+        log.error(f"Error: VCF file not found at {vcf_path}")
+        return
     
-    # Split into individual vCard entries
-    vcards = re.split(r"(?=BEGIN:VCARD)", content)
+    if os.path.getsize(vcf_path) == 0:
+        return
     
-    for vcard in vcards:
-        if not vcard.strip() or not vcard.startswith("BEGIN:VCARD"):
-            continue
-        
-        lines = vcard.split("\n")
+    with open(vcf_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
         name = None
-        phones = []
+        phones: list[str] = []
         
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
+        # One pass over the whole file; only FN and TEL values are ever decoded
+        for token in _TOKEN_RE.finditer(mm):
+            boundary, field, params, value = token.groups()
             
-            # Parse FN (full name) field
-            if line.startswith("FN"):
-                # Extract the value after the colon (and any parameters)
-                parts = line.split(":", 1)
-                if len(parts) > 1:
-                    raw_name = parts[1].strip()
-                    
-                    # Check if it's quoted-printable encoded
-                    if "ENCODING=QUOTED-PRINTABLE" in line:
-                        name = decode_quoted_printable(raw_name)
-                    else:
-                        name = raw_name
+            if boundary == b"BEGIN":
+                name = None
+                phones = []
             
-            # Parse TEL (phone) fields
-            elif line.startswith("TEL"):
-                # Extract the phone number after the colon
-                parts = line.split(":", 1)
-                if len(parts) > 1:
-                    phone = parts[1].strip()
-                    # Normalize: remove spaces, dashes, parentheses
-                    normalized = phone.replace(" ", "").replace("-", "").replace("(", "").replace(")", "")
-                    if normalized:
-                        phones.append(normalized)
-        
-        # Add all phone numbers to mapping
-        if name and phones:
-            for phone in phones:
-                # Add with + if not already present
-                if not phone.startswith("+"):
-                    mapping[f"+{phone}"] = name
-                # Also add without + (some DBs store it this way)
-                mapping[phone.lstrip("+")] = name
-                # Add the phone as-is (might already have +)
-                mapping[phone] = name
-    
-    return mapping
+            elif boundary == b"END":
+                # Yield every phone number in its canonical form without "+"
+                # (the way WhatsApp JIDs store them)
+                if name and phones:
+                    for phone in phones:
+                        # Interned so lookups with interned JID numbers hit the
+                        # identity fast path in dict probing
+                        yield (sys.intern(phone.lstrip("+")), name)
+            
+            elif field == b"FN":
+                raw_name = _decode_value(value.strip())
+                
+                # Check if it's quoted-printable encoded
+                if b"ENCODING=QUOTED-PRINTABLE" in params:
+                    name = decode_quoted_printable(raw_name)
+                else:
+                    name = raw_name
+            
+            elif field == b"TEL":
+                phone = _decode_value(value.strip())
+                # Normalize: remove spaces, dashes, parentheses
+                normalized = phone.translate(_PHONE_STRIP)
+                if normalized:
+                    phones.append(normalized)
+            
+            # Anything else is a skipped binary field